@@ -6,96 +6,199 @@ Outputs JSON files matching the dashboard's expected format.
 """
 
 import json
+import os
+import re
+import sqlite3
 import subprocess
 import sys
+import time
 from collections import defaultdict
-from datetime import datetime, timedelta
 
 ORG = "ai-village-agents"
 
-def run_gh_api(endpoint):
-    """Run a gh api command and return parsed JSON."""
-    cmd = ["gh", "api", endpoint, "--paginate"]
+# The org's repo list rarely changes, so reuse a recent listing
+REPOS_CACHE_PATH = "data/.repos.cache.json"
+REPOS_CACHE_TTL = 3600  # seconds
+
+# ETag-validated gh api pages, reused across runs
+CACHE_PATH = "data/.gh_cache.sqlite"
+
+NEXT_LINK_RE = re.compile(r'<([^>]+)>;\s*rel="next"')
+API_URL = "https://api.github.com/"
+
+class GhApiError(RuntimeError):
+    """Raised when a gh api call fails or returns an unusable response."""
+
+class ResponseCache:
+    """SQLite store of gh api page bodies keyed by endpoint, validated via ETag."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(endpoint TEXT PRIMARY KEY, etag TEXT, next_endpoint TEXT, body TEXT)"
+        )
+
+    def get(self, endpoint):
+        """Return (etag, body, next_endpoint) for an endpoint, or None."""
+        return self._conn.execute(
+            "SELECT etag, body, next_endpoint FROM responses WHERE endpoint = ?", (endpoint,)
+        ).fetchone()
+
+    def put(self, endpoint, etag, body, next_endpoint):
+        # Committed per page so an interrupted run keeps what it fetched
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (endpoint, etag, next_endpoint, body),
+            )
+
+    def close(self):
+        self._conn.close()
+
+# Opened by main(); None leaves every request unconditional
+CACHE = None
+
+def run_gh_page(endpoint, etag=None):
+    """Fetch one page with `gh api -i` and return (status, headers, body).
+
+    With an etag the request is conditional, and a 304 is returned rather
+    than raised.
+    """
+    cmd = ["gh", "api", "-i", endpoint]
+    if etag:
+        cmd += ["-H", f"If-None-Match: {etag}"]
+    # capture_output drains stdout and stderr together, so a chatty gh can't block
     result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Error fetching {endpoint}: {result.stderr}", file=sys.stderr)
-        return []
+    head, _, body = result.stdout.partition("\n\n")
+    status_line, *header_lines = head.splitlines()
     try:
-        return json.loads(result.stdout)
-    except json.JSONDecodeError:
-        # Handle paginated results (multiple JSON objects)
-        items = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                try:
-                    data = json.loads(line)
-                    if isinstance(data, list):
-                        items.extend(data)
-                    else:
-                        items.append(data)
-                except:
-                    pass
-        return items
+        status = int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise GhApiError(f"Error fetching {endpoint}: {result.stderr}")
+    # gh exits non-zero for any status above 299, including 304 Not Modified
+    if result.returncode != 0 and not (etag and status == 304):
+        raise GhApiError(f"Error fetching {endpoint}: {result.stderr}")
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, body
+
+def run_gh_api(endpoint):
+    """Yield the items of every page of a gh api listing, one page at a time.
+
+    Pagination follows the Link header, so only one page is held in memory.
+    A page's items are yielded only after its gh call succeeds; a failed or
+    malformed page raises GhApiError. Pages already in CACHE are revalidated
+    with If-None-Match, and a 304 reuses the stored body.
+    """
+    while endpoint:
+        cached = CACHE.get(endpoint) if CACHE else None
+        status, headers, body = run_gh_page(endpoint, cached[0] if cached else None)
+        if status == 304:
+            _, body, next_endpoint = cached
+        else:
+            match = NEXT_LINK_RE.search(headers.get("link", ""))
+            next_endpoint = match.group(1).replace(API_URL, "/", 1) if match else None
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            raise GhApiError(f"Error fetching {endpoint}: response is not JSON")
+        if CACHE and status != 304 and headers.get("etag"):
+            CACHE.put(endpoint, headers["etag"], body, next_endpoint)
+        if isinstance(data, list):
+            yield from data
+        else:
+            yield data
+        endpoint = next_endpoint
+
+def fetch_items(endpoint):
+    """Return every item for endpoint, or [] after reporting a failed fetch.
+
+    Pages are collected before returning so a listing that fails midway is
+    dropped as a whole instead of being counted partially.
+    """
+    try:
+        return list(run_gh_api(endpoint))
+    except GhApiError as e:
+        print(e, file=sys.stderr)
+        return []
 
 def get_repos():
-    """Get all repos in the organization."""
-    repos = run_gh_api(f"/orgs/{ORG}/repos?per_page=100")
-    return [r["name"] for r in repos if not r.get("archived")]
+    """Get all repos in the organization, cached for REPOS_CACHE_TTL seconds."""
+    if os.path.exists(REPOS_CACHE_PATH) and time.time() - os.path.getmtime(REPOS_CACHE_PATH) < REPOS_CACHE_TTL:
+        with open(REPOS_CACHE_PATH) as f:
+            return json.load(f)
+        
+    try:
+        items = list(run_gh_api(f"/orgs/{ORG}/repos?per_page=100"))
+    except GhApiError as e:
+        # A failed or truncated listing is reported but never cached
+        print(e, file=sys.stderr)
+        return []
+    repos = [r["name"] for r in items if not r.get("archived")]
+    with open(REPOS_CACHE_PATH, "w") as f:
+        json.dump(repos, f)
+    return repos
 
 def get_contributors_for_repo(repo):
     """Get commit contributors for a repo."""
-    contributors = run_gh_api(f"/repos/{ORG}/{repo}/contributors?per_page=100")
+    contributors = fetch_items(f"/repos/{ORG}/{repo}/contributors?per_page=100")
     return {c["login"]: c["contributions"] for c in contributors if isinstance(c, dict)}
 
 def get_prs_for_repo(repo):
-    """Get PRs for a repo (last 100)."""
-    prs = run_gh_api(f"/repos/{ORG}/{repo}/pulls?state=all&per_page=100")
-    return prs
+    """Return all PRs for a repo."""
+    return fetch_items(f"/repos/{ORG}/{repo}/pulls?state=all&per_page=100")
 
 def get_reviews_for_pr(repo, pr_number):
-    """Get reviews for a specific PR."""
-    reviews = run_gh_api(f"/repos/{ORG}/{repo}/pulls/{pr_number}/reviews")
-    return reviews
+    """Return reviews for a specific PR."""
+    return fetch_items(f"/repos/{ORG}/{repo}/pulls/{pr_number}/reviews")
 
 def main():
-    print("Fetching repos...")
-    repos = get_repos()
-    print(f"Found {len(repos)} repos: {repos}")
-    
-    agent_stats = defaultdict(lambda: {
-        "total": 0,
-        "pull_requests": 0,
-        "reviews": 0,
-        "commits": 0,
-        "discussions": 0
-    })
-    
-    # Fetch commits per contributor
-    print("\nFetching commit data...")
-    for repo in repos:
-        contributors = get_contributors_for_repo(repo)
-        for login, count in contributors.items():
-            agent_stats[login]["commits"] += count
-            agent_stats[login]["total"] += count
-    
-    # Fetch PR data
-    print("\nFetching PR data...")
-    for repo in repos:
-        prs = get_prs_for_repo(repo)
-        for pr in prs:
-            if isinstance(pr, dict) and "user" in pr:
-                author = pr["user"]["login"]
-                agent_stats[author]["pull_requests"] += 1
-                agent_stats[author]["total"] += 1
-                
-                # Get reviews for this PR (limit to first 5 PRs per repo to avoid rate limits)
-                if agent_stats[author]["pull_requests"] <= 5:
-                    reviews = get_reviews_for_pr(repo, pr["number"])
-                    for review in reviews:
-                        if isinstance(review, dict) and "user" in review:
-                            reviewer = review["user"]["login"]
-                            agent_stats[reviewer]["reviews"] += 1
-                            agent_stats[reviewer]["total"] += 1
+    global CACHE
+    CACHE = ResponseCache(CACHE_PATH)
+    try:
+        print("Fetching repos...")
+        repos = get_repos()
+        print(f"Found {len(repos)} repos: {repos}")
+        
+        agent_stats = defaultdict(lambda: {
+            "total": 0,
+            "pull_requests": 0,
+            "reviews": 0,
+            "commits": 0,
+            "discussions": 0
+        })
+        
+        # Fetch commits per contributor
+        print("\nFetching commit data...")
+        for repo in repos:
+            contributors = get_contributors_for_repo(repo)
+            for login, count in contributors.items():
+                agent_stats[login]["commits"] += count
+                agent_stats[login]["total"] += count
+        
+        # Fetch PR data
+        print("\nFetching PR data...")
+        for repo in repos:
+            prs = get_prs_for_repo(repo)
+            for pr in prs:
+                if isinstance(pr, dict) and "user" in pr:
+                    author = pr["user"]["login"]
+                    agent_stats[author]["pull_requests"] += 1
+                    agent_stats[author]["total"] += 1
+                    
+                    # Get reviews for this PR (limit to first 5 PRs per repo to avoid rate limits)
+                    if agent_stats[author]["pull_requests"] <= 5:
+                        reviews = get_reviews_for_pr(repo, pr["number"])
+                        for review in reviews:
+                            if isinstance(review, dict) and "user" in review:
+                                reviewer = review["user"]["login"]
+                                agent_stats[reviewer]["reviews"] += 1
+                                agent_stats[reviewer]["total"] += 1
+    finally:
+        CACHE.close()
     
     # Convert to output format
     output = []
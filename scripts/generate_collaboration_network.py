@@ -5,12 +5,36 @@ Edges represent PR review interactions between agents.
 """
 
 import json
-import subprocess
+import os
+import re
 import sys
-from collections import defaultdict
-from datetime import datetime
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+try:
+    import orjson
+except ImportError:  # API responses are then decoded with the stdlib json module
+    orjson = None
 
 ORG = "ai-village-agents"
+API_URL = "https://api.github.com"
+GRAPHQL_URL = f"{API_URL}/graphql"
+
+# Upper bound on concurrent GitHub API requests
+MAX_CONCURRENCY = 16
+# Retries of a rate-limited request before the run is aborted
+MAX_RETRIES = 3
+# Wait before retrying a 429 that carries no reset hint (GitHub suggests a minute)
+DEFAULT_RETRY_DELAY = 60
+
+# GitHub search returns at most this many results per query
+SEARCH_LIMIT = 1000
+# Earliest PR creation date searched (predates the village)
+SEARCH_EPOCH = date(2024, 1, 1)
 
 # Map GitHub usernames to display names
 DISPLAY_NAMES = {
@@ -30,116 +54,223 @@ DISPLAY_NAMES = {
 }
 
 # AI agent usernames (exclude humans/bots)
-AI_AGENTS = {
+AI_AGENTS = frozenset({
     "claude-3-7-sonnet", "deepseek-v32", "gemini-3-pro-ai-village",
     "claudehaiku45", "claude-opus-4-6", "gpt-5-1", "claude-sonnet-45",
     "gemini-25-pro-collab", "claude-opus-4-5", "gpt-5-ai-village"
+})
+
+NEXT_LINK_RE = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+HEADERS = {
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
 }
 
-def run_gh_api(endpoint):
-    """Run a gh api command and return parsed JSON."""
-    cmd = ["gh", "api", endpoint, "--paginate"]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Error fetching {endpoint}: {result.stderr}", file=sys.stderr)
-        return []
-    try:
-        return json.loads(result.stdout)
-    except json.JSONDecodeError:
-        items = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                try:
-                    data = json.loads(line)
-                    if isinstance(data, list):
-                        items.extend(data)
-                    else:
-                        items.append(data)
-                except:
-                    pass
-        return items
-
-def get_repos():
-    """Get all repos in the organization."""
-    repos = run_gh_api(f"/orgs/{ORG}/repos?per_page=100")
-    return [r["name"] for r in repos if not r.get("archived")]
-
-def get_prs_for_repo(repo):
-    """Get PRs for a repo (last 100)."""
-    prs = run_gh_api(f"/repos/{ORG}/{repo}/pulls?state=all&per_page=100")
-    return prs
+def load_json(data):
+    """Parse JSON text or bytes, using orjson when installed."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def dump_json(payload):
+    """Return the network as compact JSON bytes ending in a newline."""
+    if orjson:
+        return orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+def get_token():
+    """Read the GitHub token from the environment."""
+    token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
+    if not token:
+        sys.exit("Set GH_TOKEN (e.g. `export GH_TOKEN=$(gh auth token)`) to query the GitHub API.")
+    return token
+
+def rate_limit_delay(headers):
+    """Return seconds to wait before the next request, or None if not rate limited."""
+    if headers.get("Retry-After"):
+        return int(headers["Retry-After"])
+    if headers.get("X-RateLimit-Remaining") == "0":
+        reset_at = int(headers.get("X-RateLimit-Reset", time.time()))
+        return max(reset_at - time.time(), 0) + 1
+    return None
+
+def wait_for_rate_limit(headers):
+    """Sleep until the rate limit window resets once no requests remain."""
+    delay = rate_limit_delay(headers)
+    if delay is not None:
+        print(f"Rate limit exhausted, sleeping {delay:.0f}s", file=sys.stderr)
+        time.sleep(delay)
+
+def urlopen_with_retry(request, timeout):
+    """Open a request, retrying 403/429 rate-limit responses after the advertised wait."""
+    for _ in range(MAX_RETRIES):
+        try:
+            return urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            if e.code not in (403, 429):
+                raise
+            delay = rate_limit_delay(e.headers)
+            if delay is None:
+                # A 403 without rate-limit headers is a permission error
+                if e.code == 403:
+                    raise
+                delay = DEFAULT_RETRY_DELAY
+            print(f"Rate limited ({e.code}), retrying in {delay:.0f}s", file=sys.stderr)
+            time.sleep(delay)
+    return urllib.request.urlopen(request, timeout=timeout)
+
+def fetch_page(url):
+    """Fetch one page and return its parsed JSON and the next page URL."""
+    request = urllib.request.Request(url, headers=HEADERS)
+    with urlopen_with_retry(request, timeout=30) as response:
+        body = response.read()
+        match = NEXT_LINK_RE.search(response.headers.get("Link") or "")
+        wait_for_rate_limit(response.headers)
+    return load_json(body), (match.group(1) if match else None)
+
+def fetch_api(endpoint):
+    """Fetch a REST endpoint, following pagination, and return all items."""
+    url = f"{API_URL}{endpoint}"
+    items = []
+    while url:
+        data, url = fetch_page(url)
+        if isinstance(data, list):
+            items.extend(data)
+        else:
+            items.append(data)
+    return items
+
+SEARCH_PR_REVIEWS_QUERY = """
+query($query: String!, $cursor: String) {
+  search(query: $query, type: ISSUE, first: 100, after: $cursor) {
+    issueCount
+    pageInfo { hasNextPage endCursor }
+    nodes {
+      ... on PullRequest {
+        number
+        repository { name }
+        reviews(first: 100) {
+          pageInfo { hasNextPage }
+          nodes { author { login } }
+        }
+      }
+    }
+  }
+}
+"""
+
+def run_graphql(query, variables):
+    """POST a GraphQL query and return its data."""
+    payload = json.dumps({"query": query, "variables": variables}).encode("utf-8")
+    request = urllib.request.Request(GRAPHQL_URL, data=payload, headers=HEADERS)
+    with urlopen_with_retry(request, timeout=60) as response:
+        result = load_json(response.read())
+        wait_for_rate_limit(response.headers)
+    if result.get("errors"):
+        raise ValueError(result["errors"][0].get("message"))
+    return result["data"]
 
 def get_reviews_for_pr(repo, pr_number):
     """Get reviews for a specific PR."""
-    reviews = run_gh_api(f"/repos/{ORG}/{repo}/pulls/{pr_number}/reviews")
+    reviews = fetch_api(f"/repos/{ORG}/{repo}/pulls/{pr_number}/reviews?per_page=100")
     return reviews
 
+def search_agent_prs(login, start=SEARCH_EPOCH, end=None):
+    """Get the reviewer logins of every PR the agent opened in the org.
+
+    Windows holding more than SEARCH_LIMIT PRs are split by creation date.
+    """
+    end = end or date.today() + timedelta(days=1)
+    query = f"is:pr author:{login} org:{ORG} archived:false created:{start}..{end}"
+    results = []
+    cursor = None
+    while True:
+        search = run_graphql(SEARCH_PR_REVIEWS_QUERY, {"query": query, "cursor": cursor})["search"]
+        if search["issueCount"] > SEARCH_LIMIT and start < end:
+            mid = start + (end - start) // 2
+            return search_agent_prs(login, start, mid) + search_agent_prs(login, mid + timedelta(days=1), end)
+        for pr in search["nodes"]:
+            reviews = pr["reviews"]
+            if reviews["pageInfo"]["hasNextPage"]:
+                # Rare: more reviews than fit in one page, fetch the full list over REST
+                reviews = get_reviews_for_pr(pr["repository"]["name"], pr["number"])
+                reviewers = [r.get("user", {}).get("login") for r in reviews if isinstance(r, dict)]
+            else:
+                reviewers = [(r.get("author") or {}).get("login") for r in reviews["nodes"]]
+            # Only AI agent reviews become edges; drop the rest before they reach main()
+            results.append([r for r in reviewers if r in AI_AGENTS])
+        if not search["pageInfo"]["hasNextPage"]:
+            return results
+        cursor = search["pageInfo"]["endCursor"]
+
+def fetch_agent_prs(login):
+    """Get reviewer lists for the agent's PRs, or None if the search fails."""
+    try:
+        return search_agent_prs(login)
+    except (OSError, ValueError) as e:
+        print(f"Error searching PRs by {login}: {e}", file=sys.stderr)
+        return None
+
 def main():
     print("Generating collaboration network from GitHub data...")
     
-    repos = get_repos()
-    print(f"Found {len(repos)} repos")
+    HEADERS["Authorization"] = f"Bearer {get_token()}"
     
-    # Edge weights: interaction count between agents
-    edge_weights = defaultdict(int)
+    # Search each agent's PRs across the org instead of walking every repo
+    agents = sorted(AI_AGENTS)
+    agent_ids = {name: i for i, name in enumerate(agents)}
+    n_agents = len(agents)
+    
+    # Edge weights: interaction count between agents, keyed by the packed
+    # id pair min_id * n_agents + max_id
+    edge_weights = Counter()
     agent_participation = set()
     
-    # Process each repo
-    for repo_idx, repo in enumerate(repos):
-        print(f"  Processing {repo} ({repo_idx+1}/{len(repos)})")
-        prs = get_prs_for_repo(repo)
-        
-        for pr in prs:
-            if not isinstance(pr, dict):
-                continue
-            
-            # Get PR author
-            author = pr.get("user", {}).get("login")
-            if not author:
-                continue
-            
-            # Only consider AI agents
-            if author not in AI_AGENTS:
-                continue
-            
+    output_path = "data/collaboration_network_real.json"
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        agent_prs = list(executor.map(fetch_agent_prs, agents))
+    
+    # A missing agent would silently drop its edges, so keep the previous file
+    failed = [author for author, prs in zip(agents, agent_prs) if prs is None]
+    if failed:
+        sys.exit(f"PR search failed for {', '.join(failed)}; not updating {output_path}")
+    
+    for agent_idx, (author, prs) in enumerate(zip(agents, agent_prs)):
+        print(f"  Processing {author} ({agent_idx+1}/{len(agents)}): {len(prs)} PRs")
+        if prs:
             agent_participation.add(author)
-            
-            # Get reviews for this PR
-            pr_number = pr.get("number")
-            if not pr_number:
-                continue
-            
-            reviews = get_reviews_for_pr(repo, pr_number)
-            for review in reviews:
-                if not isinstance(review, dict):
-                    continue
-                
-                reviewer = review.get("user", {}).get("login")
-                if not reviewer or reviewer == author:
-                    continue
-                
-                if reviewer not in AI_AGENTS:
-                    continue
-                
-                # Add edge (undirected)
-                edge_key = tuple(sorted([author, reviewer]))
-                edge_weights[edge_key] += 1
-                agent_participation.add(reviewer)
+        
+        author_id = agent_ids[author]
+        for reviewers in prs:
+            # Add edges (undirected) for reviewers other than the author;
+            # search_agent_prs already kept only AI agent reviewers
+            edge_weights.update(
+                author_id * n_agents + r if author_id < r else r * n_agents + author_id
+                for r in map(agent_ids.__getitem__, reviewers)
+                if r != author_id
+            )
+    
+    # Unpack edge keys back to agent names, heaviest first
+    weighted_pairs = []
+    for key, weight in edge_weights.most_common():
+        low_id, high_id = divmod(key, n_agents)
+        pair = (agents[low_id], agents[high_id])
+        agent_participation.update(pair)
+        weighted_pairs.append((pair, weight))
+    
+    # Resolve each participant's display name once
+    display = {agent: DISPLAY_NAMES.get(agent, agent) for agent in agent_participation}
     
     # Build nodes list
     nodes = []
     for agent in sorted(agent_participation):
-        display_name = DISPLAY_NAMES.get(agent, agent)
-        nodes.append({"id": display_name})
+        nodes.append({"id": display[agent]})
     
     # Build edges list
     edges = []
-    for (agent1, agent2), weight in sorted(edge_weights.items(), key=lambda x: -x[1]):
-        display1 = DISPLAY_NAMES.get(agent1, agent1)
-        display2 = DISPLAY_NAMES.get(agent2, agent2)
+    for (agent1, agent2), weight in weighted_pairs:
         edges.append({
-            "source": display1,
-            "target": display2,
+            "source": display[agent1],
+            "target": display[agent2],
             "weight": weight
         })
     
@@ -150,9 +281,8 @@ def main():
     }
     
     # Save to file
-    output_path = "data/collaboration_network_real.json"
-    with open(output_path, "w") as f:
-        json.dump(network, f, indent=2)
+    with open(output_path, "wb") as f:
+        f.write(dump_json(network))
     
     print(f"\nSaved collaboration network to {output_path}")
     print(f"  Nodes: {len(nodes)}")
@@ -12,11 +12,16 @@ Time Capsule documents, timeline periods, and the shared knowledge frameworks.
 """
 from __future__ import annotations
 
+import heapq
 import json
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Set, Tuple
 
+try:
+    import orjson
+except ImportError:  # fall back to json for reading inputs and writing sections
+    orjson = None
 
 ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT / "data"
@@ -26,35 +31,38 @@ TIMELINE_PATH = DATA_DIR / "village_timeline.json"
 OUTPUT_PATH = DATA_DIR / "knowledge_integration.json"
 
 
-def load_json(path: Path):
+def load_json(data):
+    """Parse JSON text or bytes, using orjson when installed."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def dump_json(payload) -> bytes:
+    """Return one payload key or section as compact JSON bytes."""
+    if orjson:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def read_input(path: Path):
     if not path.exists():
         raise FileNotFoundError(f"Missing required input: {path}")
-    with path.open() as f:
-        return json.load(f)
+    return load_json(path.read_bytes())
 
 
-def overlaps(a_start: int, a_end: int, b_start: int, b_end: int) -> Optional[Tuple[int, int]]:
-    """Return the overlapping day range between [a_start, a_end] and [b_start, b_end]."""
-    start = max(a_start, b_start)
-    end = min(a_end, b_end)
-    if start > end:
-        return None
-    return start, end
+def load_inputs() -> Tuple[List[dict], dict, dict]:
+    """Read the goals, Time Capsule mappings, and timeline files concurrently."""
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        goals, timecapsule, timeline = executor.map(read_input, (GOALS_PATH, TIMECAPSULE_PATH, TIMELINE_PATH))
+    return goals, timecapsule, timeline
 
 
 def normalize_timeline_periods(timeline: List[dict], goals: List[dict]) -> List[dict]:
     """Attach a stable id to each timeline period and map it back to a goal when possible."""
+    # Reversed so the first goal wins when several share a day range
+    goal_by_range = {(g.get("start_day"), g.get("end_day")): g for g in reversed(goals)}
     periods: List[dict] = []
     for idx, period in enumerate(timeline):
-        matched_goal = next(
-            (
-                g
-                for g in goals
-                if g.get("start_day") == period.get("start_day")
-                and g.get("end_day") == period.get("end_day")
-            ),
-            None,
-        )
+        matched_goal = goal_by_range.get((period.get("start_day"), period.get("end_day")))
         period_id = matched_goal["slug"] if matched_goal else f"timeline-{idx + 1}"
         periods.append(
             {
@@ -73,15 +81,25 @@ def normalize_timeline_periods(timeline: List[dict], goals: List[dict]) -> List[
     return periods
 
 
-def build_goal_documents_map(timecapsule_docs: Iterable[dict]) -> Dict[str, List[dict]]:
-    """Return goal_slug -> list of overlapping documents with overlap metadata."""
+def build_document_entries(
+    timecapsule_docs: Iterable[dict], framework_ids: List[str]
+) -> Tuple[List[dict], Dict[str, List[str]], Dict[str, List[dict]]]:
+    """Return document payloads, document -> goal slugs, and goal_slug -> overlapping documents.
+
+    All three are filled in a single pass over the Time Capsule documents.
+    """
+    docs_payload: List[dict] = []
+    doc_to_goals: Dict[str, List[str]] = {}
     goal_to_docs: Dict[str, List[dict]] = {}
     for doc_block in timecapsule_docs:
-        doc_name = doc_block["document"]["name"]
-        for overlap in doc_block.get("overlapping_goals", []):
+        doc_info = doc_block["document"]
+        name = doc_info["name"]
+        overlapping_goals = doc_block.get("overlapping_goals", [])
+        doc_to_goals[name] = [g["goal_slug"] for g in overlapping_goals]
+        for overlap in overlapping_goals:
             goal_to_docs.setdefault(overlap["goal_slug"], []).append(
                 {
-                    "document": doc_name,
+                    "document": name,
                     "overlap_start_day": overlap["overlap_start_day"],
                     "overlap_end_day": overlap["overlap_end_day"],
                     "overlap_days": overlap["overlap_days"],
@@ -89,21 +107,60 @@ def build_goal_documents_map(timecapsule_docs: Iterable[dict]) -> Dict[str, List
                     "document_coverage_pct": overlap["document_coverage_pct"],
                 }
             )
-    return goal_to_docs
+        docs_payload.append(
+            {
+                "name": name,
+                "description": doc_info.get("description"),
+                "author": doc_info.get("author"),
+                "category": doc_info.get("category"),
+                "start_day": doc_info.get("start_day"),
+                "end_day": doc_info.get("end_day"),
+                "duration_days": doc_info.get("duration_days"),
+                "period": doc_info.get("period"),
+                "link": doc_info.get("link"),
+                "overlapping_goals": overlapping_goals,
+                "timeline_periods": [],
+                "knowledge_frameworks": framework_ids,
+            }
+        )
+    return docs_payload, doc_to_goals, goal_to_docs
 
 
 def build_timeline_document_links(periods: List[dict], documents: List[dict]) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
-    """Return mappings between timeline ids and overlapping documents."""
+    """Return mappings between timeline ids and overlapping documents.
+
+    Periods and documents are swept in start-day order with a heap of documents
+    still open, so only pairs that can overlap are examined.
+    """
     timeline_to_docs: Dict[str, List[str]] = {p["id"]: [] for p in periods}
     doc_to_timeline: Dict[str, List[str]] = {}
 
-    for period in periods:
-        for doc in documents:
-            overlap_range = overlaps(period["start_day"], period["end_day"], doc["start_day"], doc["end_day"])
-            if not overlap_range:
-                continue
-            timeline_to_docs[period["id"]].append(doc["name"])
-            doc_to_timeline.setdefault(doc["name"], []).append(period["id"])
+    period_order = sorted(range(len(periods)), key=lambda i: periods[i]["start_day"])
+    doc_order = sorted(range(len(documents)), key=lambda j: documents[j]["start_day"])
+    open_docs: List[Tuple[int, int]] = []  # (end_day, document index)
+    pairs: List[Tuple[int, int]] = []
+    next_doc = 0
+    for i in period_order:
+        period = periods[i]
+        while next_doc < len(doc_order) and documents[doc_order[next_doc]]["start_day"] <= period["end_day"]:
+            j = doc_order[next_doc]
+            # An inverted day range (end before start) overlaps nothing
+            if documents[j]["end_day"] >= documents[j]["start_day"]:
+                heapq.heappush(open_docs, (documents[j]["end_day"], j))
+            next_doc += 1
+        # Period starts only increase, so documents ending earlier never overlap again
+        while open_docs and open_docs[0][0] < period["start_day"]:
+            heapq.heappop(open_docs)
+        if period["end_day"] < period["start_day"]:
+            continue
+        # Period ends are unordered: skip documents pushed for an earlier, longer period
+        pairs.extend((i, j) for _, j in open_docs if documents[j]["start_day"] <= period["end_day"])
+
+    # Emit in period-then-document order, matching a plain nested scan
+    pairs.sort()
+    for i, j in pairs:
+        timeline_to_docs[periods[i]["id"]].append(documents[j]["name"])
+        doc_to_timeline.setdefault(documents[j]["name"], []).append(periods[i]["id"])
 
     # Sort for stable output
     for doc_list in timeline_to_docs.values():
@@ -138,40 +195,29 @@ def knowledge_frameworks_metadata() -> List[dict]:
     ]
 
 
-def build_payload() -> dict:
-    goals = load_json(GOALS_PATH)
-    timecapsule = load_json(TIMECAPSULE_PATH)
-    timeline = load_json(TIMELINE_PATH).get("goals", [])
+def iter_payload() -> Iterator[Tuple[str, object]]:
+    """Yield the top-level payload sections in output order as each becomes ready."""
+    from datetime import datetime, timezone
 
-    frameworks = knowledge_frameworks_metadata()
-    framework_ids = [fw["id"] for fw in frameworks]
+    yield "generated_at", datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+    yield "sources", {
+        "village_goals": str(GOALS_PATH),
+        "timecapsule_goal_mappings": str(TIMECAPSULE_PATH),
+        "village_timeline": str(TIMELINE_PATH),
+    }
 
-    goal_to_docs = build_goal_documents_map(timecapsule.get("documents", []))
+    goals, timecapsule, timeline_data = load_inputs()
+    timeline = timeline_data.get("goals", [])
 
-    timeline_periods = normalize_timeline_periods(timeline, goals)
+    frameworks = knowledge_frameworks_metadata()
+    framework_ids = [fw["id"] for fw in frameworks]
 
-    docs_payload: List[dict] = []
-    doc_to_goals: Dict[str, List[str]] = {}
-    for doc_block in timecapsule.get("documents", []):
-        doc_info = doc_block["document"]
-        name = doc_info["name"]
-        doc_to_goals[name] = [g["goal_slug"] for g in doc_block.get("overlapping_goals", [])]
-        docs_payload.append(
-            {
-                "name": name,
-                "description": doc_info.get("description"),
-                "author": doc_info.get("author"),
-                "category": doc_info.get("category"),
-                "start_day": doc_info.get("start_day"),
-                "end_day": doc_info.get("end_day"),
-                "duration_days": doc_info.get("duration_days"),
-                "period": doc_info.get("period"),
-                "link": doc_info.get("link"),
-                "overlapping_goals": doc_block.get("overlapping_goals", []),
-                "timeline_periods": [],
-                "knowledge_frameworks": framework_ids,
-            }
-        )
+    # Document and timeline normalization are independent until they are linked below
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        documents_future = executor.submit(build_document_entries, timecapsule.get("documents", []), framework_ids)
+        periods_future = executor.submit(normalize_timeline_periods, timeline, goals)
+        docs_payload, doc_to_goals, goal_to_docs = documents_future.result()
+        timeline_periods = periods_future.result()
 
     timeline_to_docs, doc_to_timeline = build_timeline_document_links(timeline_periods, docs_payload)
     for period in timeline_periods:
@@ -216,41 +262,60 @@ def build_payload() -> dict:
             }
         )
 
+    # Every framework relates to every entity, so all entries share one mapping
+    framework_entities = {
+        "goals": all_goal_slugs,
+        "documents": all_doc_names,
+        "timeline_periods": all_timeline_ids,
+    }
     references = {
         "goal_to_documents": {goal["slug"]: [d["document"] for d in goal_to_docs.get(goal["slug"], [])] for goal in goals},
         "document_to_goals": doc_to_goals,
         "timeline_to_documents": timeline_to_docs,
         "document_to_timeline": doc_to_timeline,
-        "knowledge_framework_to_entities": {
-            fw["id"]: {
-                "goals": all_goal_slugs,
-                "documents": all_doc_names,
-                "timeline_periods": all_timeline_ids,
-            }
-            for fw in frameworks
-        },
+        "knowledge_framework_to_entities": {fw["id"]: framework_entities for fw in frameworks},
     }
 
-    return {
-        "generated_at": datetime.utcnow().isoformat() + "Z",
-        "sources": {
-            "village_goals": str(GOALS_PATH),
-            "timecapsule_goal_mappings": str(TIMECAPSULE_PATH),
-            "village_timeline": str(TIMELINE_PATH),
-        },
-        "goals": goals_payload,
-        "timecapsule_documents": docs_payload,
-        "timeline_periods": timeline_periods,
-        "knowledge_frameworks": frameworks_payload,
-        "references": references,
-    }
+    # Everything later sections need is computed above, so each large section
+    # (and the inputs it was built from) is released once it has been written
+    del goals, goal_to_docs, timecapsule, timeline_data, timeline, documents_future, periods_future
+    yield "goals", goals_payload
+    del goals_payload
+    yield "timecapsule_documents", docs_payload
+    del docs_payload
+    yield "timeline_periods", timeline_periods
+    del timeline_periods
+    yield "knowledge_frameworks", frameworks_payload
+    del frameworks_payload
+    yield "references", references
+
+
+def write_payload(f: BinaryIO, sections: Iterable[Tuple[str, object]]) -> None:
+    """Write payload sections to f one at a time as a single JSON object."""
+    f.write(b"{")
+    first = True
+    # No enumerate(): its reused result tuple would keep the last section alive
+    for key, value in sections:
+        if not first:
+            f.write(b",")
+        first = False
+        f.write(dump_json(key) + b":" + dump_json(value))
+        # Drop the reference before the next section is built
+        del value
+    f.write(b"}\n")
 
 
 def main():
-    payload = build_payload()
     OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with OUTPUT_PATH.open("w") as f:
-        json.dump(payload, f, indent=2)
+    # Stream into a temporary file so a failed run leaves the previous output intact
+    tmp_path = OUTPUT_PATH.with_name(OUTPUT_PATH.name + ".tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            write_payload(f, iter_payload())
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(OUTPUT_PATH)
     print(f"Wrote knowledge integration schema to {OUTPUT_PATH}")
 
 
@@ -2,12 +2,23 @@
 """Map Time Capsule history documents to Village goals and compute coverage stats."""
 from __future__ import annotations
 
+import heapq
 import json
 import re
-from dataclasses import dataclass
-from datetime import datetime
+import sys
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import accumulate
+from operator import itemgetter
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence, Tuple
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # goals and mapping files then go through the stdlib json module
+    orjson = None
 
 
 ROOT = Path(__file__).resolve().parent.parent
@@ -16,6 +27,14 @@ README_PATH = ROOT / ".." / "village-time-capsule" / "content" / "history" / "RE
 OUTPUT_MAPPINGS_PATH = ROOT / "data" / "timecapsule_goal_mappings.json"
 OUTPUT_COVERAGE_PATH = ROOT / "data" / "goal_coverage_stats.json"
 
+_SEP_RE = re.compile(r":?-{3,}:?")
+_SEP_CHARS = frozenset(":-")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+_DAY_RE = re.compile(r"days?\s*(\d+)\s*(?:-\s*(\d+))?", re.IGNORECASE)
+_HEADING_RE = re.compile(r"^(#{2,6})\s+(.*)")
+# Overlap rows are collected as (sort key, row) pairs
+_SORT_KEY = itemgetter(0)
+
 
 @dataclass
 class Goal:
@@ -23,10 +42,10 @@ class Goal:
     title: str
     start_day: int
     end_day: int
+    duration: int = field(init=False)
 
-    @property
-    def duration(self) -> int:
-        return self.end_day - self.start_day + 1
+    def __post_init__(self) -> None:
+        self.duration = self.end_day - self.start_day + 1
 
 
 @dataclass
@@ -39,19 +58,70 @@ class Document:
     end_day: int
     link: Optional[str] = None
     category: Optional[str] = None
+    duration: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.duration = self.end_day - self.start_day + 1
+
+
+@dataclass
+class Overlap:
+    """A goal overlapping a document, as listed in the document's mapping."""
+
+    __slots__ = (
+        "goal_slug",
+        "goal_title",
+        "goal_start_day",
+        "goal_end_day",
+        "overlap_start_day",
+        "overlap_end_day",
+        "overlap_days",
+        "goal_coverage_pct",
+        "document_coverage_pct",
+    )
+    goal_slug: str
+    goal_title: str
+    goal_start_day: int
+    goal_end_day: int
+    overlap_start_day: int
+    overlap_end_day: int
+    overlap_days: int
+    goal_coverage_pct: float
+    document_coverage_pct: float
+
+
+@dataclass
+class CoveringDocument:
+    """A document overlapping a goal, as listed in the goal's coverage stats."""
+
+    __slots__ = ("document", "link", "overlap_start_day", "overlap_end_day", "overlap_days")
+    document: str
+    link: Optional[str]
+    overlap_start_day: int
+    overlap_end_day: int
+    overlap_days: int
+
+
+def load_json(data):
+    """Parse JSON text or bytes, using orjson when installed."""
+    return orjson.loads(data) if orjson else json.loads(data)
 
-    @property
-    def duration(self) -> int:
-        return self.end_day - self.start_day + 1
+
+def dump_json(payload) -> bytes:
+    """Return the payload as JSON bytes indented by two spaces."""
+    # Overlap records are dataclasses; orjson serializes them natively
+    if orjson:
+        return orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, indent=2, default=asdict, ensure_ascii=False).encode("utf-8")
 
 
 def load_goals() -> List[Goal]:
-    with GOALS_PATH.open() as f:
-        raw = json.load(f)
+    raw = load_json(GOALS_PATH.read_bytes())
+    # Slugs and titles are repeated in every overlap row of the output
     return [
         Goal(
-            slug=item["slug"],
-            title=item["title"],
+            slug=sys.intern(item["slug"]),
+            title=sys.intern(item["title"]),
             start_day=int(item["start_day"]),
             end_day=int(item["end_day"]),
         )
@@ -60,23 +130,29 @@ def load_goals() -> List[Goal]:
 
 
 def split_row(line: str) -> List[str]:
-    parts = [part.strip() for part in line.strip().strip("|").split("|")]
-    return [p for p in parts]
+    """Split an already whitespace-stripped table row into trimmed cells."""
+    return [part.strip() for part in line.strip("|").split("|")]
 
 
 def is_separator_row(cells: Sequence[str]) -> bool:
-    return all(re.fullmatch(r":?-{3,}:?", cell) for cell in cells)
+    # The character-set check rejects data cells without running the regex
+    return all(_SEP_CHARS.issuperset(cell) and _SEP_RE.fullmatch(cell) for cell in cells)
 
 
+# Period and document cells repeat across README tables; results are
+# immutable tuples, so they are cached. 1024 entries comfortably covers the
+# distinct cells of the current README while bounding memory on odd input.
+@lru_cache(maxsize=1024)
 def parse_markdown_link(cell: str) -> Tuple[str, Optional[str]]:
-    match = re.search(r"\[([^\]]+)\]\(([^)]+)\)", cell)
+    match = _LINK_RE.search(cell)
     if match:
         return match.group(1).strip(), match.group(2).strip()
     return cell.strip(), None
 
 
+@lru_cache(maxsize=1024)
 def parse_day_range(text: str) -> Optional[Tuple[int, int]]:
-    match = re.search(r"days?\s*(\d+)\s*(?:-\s*(\d+))?", text, re.IGNORECASE)
+    match = _DAY_RE.search(text)
     if not match:
         return None
     start = int(match.group(1))
@@ -88,62 +164,78 @@ def parse_day_range(text: str) -> Optional[Tuple[int, int]]:
 
 def parse_document_tables(readme_text: str) -> List[Document]:
     documents: List[Document] = []
-    lines = readme_text.splitlines()
     current_heading: Optional[str] = None
-    i = 0
-
-    while i < len(lines):
-        line = lines[i]
-        heading_match = re.match(r"^(#{2,6})\s+(.*)", line)
-        if heading_match:
-            current_heading = heading_match.group(2).strip()
-            i += 1
-            continue
+    pending_table: List[str] = []
 
-        if line.strip().startswith("|"):
-            table_lines: List[str] = []
-            while i < len(lines) and lines[i].strip().startswith("|"):
-                table_lines.append(lines[i])
-                i += 1
-            documents.extend(parse_single_table(table_lines, current_heading))
+    for line in readme_text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("|"):
+            pending_table.append(stripped)
             continue
 
-        i += 1
+        # Any other line ends the table being collected
+        if pending_table:
+            documents.extend(parse_single_table(pending_table, current_heading))
+            pending_table = []
+
+        if line.startswith("#"):
+            heading_match = _HEADING_RE.match(line)
+            if heading_match:
+                current_heading = heading_match.group(2).strip()
+
+    if pending_table:
+        documents.extend(parse_single_table(pending_table, current_heading))
 
     return documents
 
 
-def parse_single_table(table_lines: Sequence[str], heading: Optional[str]) -> List[Document]:
-    if len(table_lines) < 2:
-        return []
+class TableColumns(NamedTuple):
+    """Column positions of a Time Capsule document table."""
 
-    header_cells = split_row(table_lines[0])
-    separator_cells = split_row(table_lines[1])
-    if not is_separator_row(separator_cells):
-        return []
+    width: int
+    document: int
+    author: int
+    description: int
+    period: int
 
-    columns = [c.lower() for c in header_cells]
-    try:
-        doc_idx = columns.index("document")
-        author_idx = columns.index("author")
-    except ValueError:
-        return []
 
+def resolve_columns(header_cells: Sequence[str]) -> Optional[TableColumns]:
+    """Return the positions of the columns a document table needs, or None."""
+    col_idx = {}
     desc_idx = None
     period_idx = None
-    for idx, col in enumerate(columns):
+    for idx, col in enumerate(c.lower() for c in header_cells):
+        col_idx.setdefault(col, idx)
         if "description" in col:
             desc_idx = idx
         if "period" in col or "example" in col:
             period_idx = idx
 
-    if desc_idx is None or period_idx is None:
+    doc_idx = col_idx.get("document")
+    author_idx = col_idx.get("author")
+    if doc_idx is None or author_idx is None or desc_idx is None or period_idx is None:
+        return None
+    return TableColumns(len(header_cells), doc_idx, author_idx, desc_idx, period_idx)
+
+
+def parse_single_table(table_lines: Sequence[str], heading: Optional[str]) -> List[Document]:
+    if len(table_lines) < 2:
         return []
 
+    header_cells = split_row(table_lines[0])
+    separator_cells = split_row(table_lines[1])
+    if not is_separator_row(separator_cells):
+        return []
+
+    columns = resolve_columns(header_cells)
+    if columns is None:
+        return []
+    width, doc_idx, author_idx, desc_idx, period_idx = columns
+
     parsed: List[Document] = []
     for row_line in table_lines[2:]:
         cells = split_row(row_line)
-        if len(cells) < len(columns):
+        if len(cells) < width:
             continue
         if is_separator_row(cells):
             continue
@@ -175,33 +267,84 @@ def parse_single_table(table_lines: Sequence[str], heading: Optional[str]) -> Li
     return parsed
 
 
-def compute_overlaps(documents: Iterable[Document], goals: Iterable[Goal]):
+def build_goal_index(goals: Sequence[Goal]) -> Tuple[List[int], List[int]]:
+    """Return goal positions sorted by start_day and the parallel list of start days."""
+    order = sorted(range(len(goals)), key=lambda i: goals[i].start_day)
+    return order, [goals[i].start_day for i in order]
+
+
+def iter_overlap_spans(
+    start_day: int,
+    end_day: int,
+    goal_starts: Sequence[int],
+    goal_ends: Sequence[int],
+    goal_reach: Sequence[int],
+) -> Iterable[Tuple[int, int, int]]:
+    """Yield (goal index, overlap start, overlap end) for goals overlapping a day range.
+
+    Goal bounds are parallel int sequences sorted by start day, so the scan
+    touches plain ints only and stops at the first goal starting after end_day.
+    goal_reach[i] is the latest end day among the first i + 1 goals; it never
+    decreases, so every goal before the first reach >= start_day has ended
+    before the range and is skipped.
+    """
+    first = bisect_left(goal_reach, start_day)
+    for index in range(first, bisect_right(goal_starts, end_day)):
+        goal_end = goal_ends[index]
+        if goal_end < start_day:
+            continue
+        goal_start = goal_starts[index]
+        yield (
+            index,
+            start_day if start_day > goal_start else goal_start,
+            end_day if end_day < goal_end else goal_end,
+        )
+
+
+def compute_mappings_and_coverage(documents: Sequence[Document], goals: Sequence[Goal]):
+    """Return (document mappings, goal coverage stats), computing each overlap once."""
+    goal_order, goal_starts = build_goal_index(goals)
+    goal_ends = [goals[i].end_day for i in goal_order]
+    goal_reach = list(accumulate(goal_ends, max))
+    # Per-goal state is indexed by position in goals, so goals sharing a slug stay apart
+    goal_docs = [[] for _ in goals]
+    # Bit i of a goal's mask is set when some document covers the goal's i-th day
+    goal_cover_mask = [0] * len(goals)
     doc_mappings = []
-    goals_list = list(goals)
 
     for doc in documents:
         overlaps = []
-        for goal in goals_list:
-            if doc.start_day > goal.end_day or doc.end_day < goal.start_day:
-                continue
-            overlap_start = max(doc.start_day, goal.start_day)
-            overlap_end = min(doc.end_day, goal.end_day)
+        for index, overlap_start, overlap_end in iter_overlap_spans(
+            doc.start_day, doc.end_day, goal_starts, goal_ends, goal_reach
+        ):
+            position = goal_order[index]
+            goal = goals[position]
             overlap_days = overlap_end - overlap_start + 1
             goal_pct = round((overlap_days / goal.duration) * 100, 2)
             doc_pct = round((overlap_days / doc.duration) * 100, 2)
             overlaps.append(
-                {
-                    "goal_slug": goal.slug,
-                    "goal_title": goal.title,
-                    "goal_start_day": goal.start_day,
-                    "goal_end_day": goal.end_day,
-                    "overlap_start_day": overlap_start,
-                    "overlap_end_day": overlap_end,
-                    "overlap_days": overlap_days,
-                    "goal_coverage_pct": goal_pct,
-                    "document_coverage_pct": doc_pct,
-                }
+                (
+                    (-overlap_days, goal.start_day),
+                    Overlap(
+                        goal.slug,
+                        goal.title,
+                        goal.start_day,
+                        goal.end_day,
+                        overlap_start,
+                        overlap_end,
+                        overlap_days,
+                        goal_pct,
+                        doc_pct,
+                    ),
+                )
             )
+            goal_docs[position].append(
+                (
+                    (-overlap_days, overlap_start),
+                    CoveringDocument(doc.name, doc.link, overlap_start, overlap_end, overlap_days),
+                )
+            )
+            goal_cover_mask[position] |= ((1 << overlap_days) - 1) << (overlap_start - goal.start_day)
 
         doc_mappings.append(
             {
@@ -216,42 +359,14 @@ def compute_overlaps(documents: Iterable[Document], goals: Iterable[Goal]):
                     "category": doc.category,
                     "link": doc.link,
                 },
-                "overlapping_goals": sorted(
-                    overlaps, key=lambda o: (-o["overlap_days"], o["goal_start_day"])
-                ),
+                "overlapping_goals": [o for _, o in sorted(overlaps, key=_SORT_KEY)],
             }
         )
 
-    return doc_mappings
-
-
-def compute_goal_coverage(documents: Iterable[Document], goals: Iterable[Goal]):
-    goals_list = list(goals)
-    docs_list = list(documents)
     stats = []
-
-    for goal in goals_list:
-        covered_days = set()
-        covering_docs = []
-
-        for doc in docs_list:
-            if doc.start_day > goal.end_day or doc.end_day < goal.start_day:
-                continue
-            overlap_start = max(doc.start_day, goal.start_day)
-            overlap_end = min(doc.end_day, goal.end_day)
-            overlap_days = overlap_end - overlap_start + 1
-            covered_days.update(range(overlap_start, overlap_end + 1))
-            covering_docs.append(
-                {
-                    "document": doc.name,
-                    "link": doc.link,
-                    "overlap_start_day": overlap_start,
-                    "overlap_end_day": overlap_end,
-                    "overlap_days": overlap_days,
-                }
-            )
-
-        coverage_pct = round((len(covered_days) / goal.duration) * 100, 2) if goal.duration else 0.0
+    for position, goal in enumerate(goals):
+        covered_days = bin(goal_cover_mask[position]).count("1")  # int.bit_count() needs Python 3.10
+        coverage_pct = round((covered_days / goal.duration) * 100, 2) if goal.duration else 0.0
         stats.append(
             {
                 "goal_slug": goal.slug,
@@ -259,30 +374,26 @@ def compute_goal_coverage(documents: Iterable[Document], goals: Iterable[Goal]):
                 "start_day": goal.start_day,
                 "end_day": goal.end_day,
                 "duration_days": goal.duration,
-                "covered_days": len(covered_days),
+                "covered_days": covered_days,
                 "coverage_pct": coverage_pct,
-                "covering_documents": sorted(
-                    covering_docs, key=lambda d: (-d["overlap_days"], d["overlap_start_day"])
-                ),
+                "covering_documents": [d for _, d in sorted(goal_docs[position], key=_SORT_KEY)],
             }
         )
 
-    return stats
+    return doc_mappings, stats
 
 
 def write_json(path: Path, payload):
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w") as f:
-        json.dump(payload, f, indent=2)
+    path.write_bytes(dump_json(payload))
 
 
 def summarize_coverage(stats: Sequence[dict]) -> str:
     if not stats:
         return "No goals available."
 
-    sorted_by_pct = sorted(stats, key=lambda g: g["coverage_pct"], reverse=True)
-    best = sorted_by_pct[:3]
-    worst = sorted(stats, key=lambda g: g["coverage_pct"])[:3]
+    best = heapq.nlargest(3, stats, key=itemgetter("coverage_pct"))
+    worst = heapq.nsmallest(3, stats, key=itemgetter("coverage_pct"))
 
     def fmt(items: Sequence[dict]) -> str:
         return "; ".join(
@@ -310,10 +421,9 @@ def main():
     readme_text = README_PATH.read_text(encoding="utf-8")
     documents = parse_document_tables(readme_text)
 
-    doc_mappings = compute_overlaps(documents, goals)
-    goal_coverage = compute_goal_coverage(documents, goals)
+    doc_mappings, goal_coverage = compute_mappings_and_coverage(documents, goals)
 
-    generated_at = datetime.utcnow().isoformat() + "Z"
+    generated_at = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
     write_json(
         OUTPUT_MAPPINGS_PATH,
         {"generated_at": generated_at, "documents": doc_mappings},